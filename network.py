@@ -1,85 +1,277 @@
-import os
+import functools
+import numpy as np
 import pandas as pd
 import json
+import pyarrow as pa
+import pyarrow.json as paj
 import pytest
+from pandas.api.types import union_categoricals
 from pathlib import Path
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+# Column types for the player files, declared up front so the reader skips inference
+PLAYER_DTYPES = {
+    'playerName': 'string[pyarrow]',
+    'eventType': 'category',
+    'age': 'int16[pyarrow]',
+    'runs': 'int32[pyarrow]',
+    'wickets': 'int32[pyarrow]'
+}
+CATEGORY_COLS = ('playerName', 'eventType', 'playerType')
+PLAYER_TYPES = ['Bowler', 'Batsman', 'All-Rounder']
+# A player has one row per event type, so rows are matched on both
+MATCH_KEYS = ['playerName', 'eventType']
+
+def _classify_players(runs, wickets, out):
+    """Write a PLAYER_TYPES code for each player into out"""
+    for i in range(runs.shape[0]):
+        out[i] = 0 if runs[i] <= 500 else (2 if wickets[i] >= 50 else 1)
+
+# Compile the rule to a native loop when numba is available
+if njit is not None:
+    _classify_players = njit(cache=True)(_classify_players)
+
+def _select_player_types(runs, wickets):
+    """Return PLAYER_TYPES codes for each player using whole-array masks"""
+    conds = [(runs > 500) & (wickets >= 50), runs > 500]
+    return np.select(conds, [2, 1], default=0).astype(np.int8)
+
+def _as_string_categorical(values):
+    """Convert values to a categorical whose categories are string[pyarrow]"""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return values.cat.rename_categories(values.cat.categories.astype('string[pyarrow]'))
+    return values.astype('string[pyarrow]').astype('category')
+
+def _unify_categories(frames, columns=CATEGORY_COLS):
+    """Convert columns to categoricals sharing one set of categories across frames"""
+    for col in columns:
+        present = [frame for frame in frames if col in frame.columns]
+        if not present:
+            continue
+        # union_categoricals needs every categories index to have the same dtype
+        categoricals = [_as_string_categorical(frame[col]) for frame in present]
+        categories = union_categoricals(categoricals).categories
+        for frame, values in zip(present, categoricals):
+            frame[col] = values.cat.set_categories(categories)
+    return frames
+
+# A small bound keeps one parse per input file plus the one it replaces after an edit
+@functools.lru_cache(maxsize=4)
+def _load_csv(csv_file, mtime):
+    """Parse a player CSV file; keyed on mtime so edited files are re-read"""
+    return pd.read_csv(
+        csv_file,
+        engine='pyarrow',
+        dtype_backend='pyarrow',
+        usecols=list(PLAYER_DTYPES),
+        dtype=PLAYER_DTYPES
+    )
+
+def _is_json_lines(json_file):
+    """Check whether a JSON file holds one flat record per line"""
+    with open(json_file, 'rb') as f:
+        first_line = f.readline()
+    try:
+        record = json.loads(first_line)
+    except ValueError:
+        return False
+    # Arrays and dict-of-lists documents are single documents, as in _load_json
+    return isinstance(record, dict) and not any(isinstance(value, (list, dict)) for value in record.values())
+
+@functools.lru_cache(maxsize=4)
+def _load_json(json_file, mtime):
+    """Parse a player JSON file; keyed on mtime so edited files are re-read"""
+    try:
+        # Arrow parses line-delimited records straight into columnar buffers
+        table = paj.read_json(json_file)
+    except pa.ArrowInvalid:
+        table = None
+
+    # A dict-of-lists or otherwise nested document parses into list/struct
+    # cells, so treat it like any other single JSON document
+    if table is not None and not any(pa.types.is_nested(field.type) for field in table.schema):
+        data = table.to_pandas(types_mapper=pd.ArrowDtype)
+    else:
+        with open(json_file, 'rb') as f:
+            data = pd.DataFrame(orjson.loads(f.read()) if orjson is not None else json.load(f))
+    # Match the CSV schema so both sources concatenate without dtype promotion
+    return data[list(PLAYER_DTYPES)].astype(PLAYER_DTYPES)
+
 class DataProcessorTester:
-    def __init__(self, input_dir="inputDataSet", output_dir="outputDataSet", temp_dir="tempDataSet"):
+    def __init__(self, input_dir="inputDataSet", output_dir="outputDataSet", temp_dir="tempDataSet", persist_intermediates=False):
         self.input_dir = input_dir
         self.output_dir = output_dir
         self.temp_dir = temp_dir
+        self.persist_intermediates = persist_intermediates
+       
+        # Build every file path once
+        input_path, output_path, temp_path = Path(input_dir), Path(output_dir), Path(temp_dir)
+        self.paths = {
+            'csv_in': input_path / "players_1990_2000.csv",
+            'json_in': input_path / "players_2000_onwards.json",
+            'test_out': output_path / "test_results.csv",
+            'odi_out': output_path / "odi_results.csv",
+            'merged': temp_path / "merged_data.parquet",
+            'processed': temp_path / "processed_data.parquet",
+            'processed_dir': temp_path / "processed_data",
+            'result': temp_path / "test_result.csv"
+        }
        
         # Create temp directory if it doesn't exist
-        os.makedirs(self.temp_dir, exist_ok=True)
+        temp_path.mkdir(parents=True, exist_ok=True)
        
     def read_csv_data(self):
         """Read CSV data for players who played between 1990-2000"""
-        csv_file = os.path.join(self.input_dir, "players_1990_2000.csv")
-        return pd.read_csv(csv_file)
+        csv_file = self.paths['csv_in']
+        return _load_csv(csv_file, csv_file.stat().st_mtime).copy()
    
     def read_json_data(self):
         """Read JSON data for players who played from 2000 onwards"""
-        json_file = os.path.join(self.input_dir, "players_2000_onwards.json")
-        with open(json_file, 'r') as f:
-            data = json.load(f)
-        return pd.DataFrame(data)
+        json_file = self.paths['json_in']
+        return _load_json(json_file, json_file.stat().st_mtime).copy()
    
     def merge_data(self):
         """Merge data from both sources and store in temp folder"""
         csv_data = self.read_csv_data()
         json_data = self.read_json_data()
        
-        # Ensure both dataframes have the same columns
+        # Both readers share one schema; with eventType on one category set too,
+        # concat appends the columns as they are instead of promoting dtypes
+        _unify_categories([csv_data, json_data], ['eventType'])
         merged_data = pd.concat([csv_data, json_data], ignore_index=True)
        
-        # Save to temp folder
-        merged_file = os.path.join(self.temp_dir, "merged_data.csv")
-        merged_data.to_csv(merged_file, index=False)
+        # Save to temp folder only when intermediates are requested
+        if self.persist_intermediates:
+            merged_data.to_parquet(self.paths['merged'], engine='pyarrow', compression='zstd')
        
         return merged_data
    
     def process_data(self, data):
         """Process data as per the requirements"""
-        # Create a copy to avoid modifying the original data
-        processed_data = data.copy()
+        processed_data = self._process_frame(data)
+       
+        # Save processed data to temp folder only when intermediates are requested
+        if self.persist_intermediates:
+            processed_data.to_parquet(self.paths['processed'], engine='pyarrow', compression='zstd')
+       
+        return processed_data
+   
+    def _process_frame(self, data):
+        """Apply the processing rules to one frame without persisting it"""
+        # No up-front copy: assign and the filter below each return a new frame,
+        # so the caller's data is never modified
+        processed_data = data
        
         # Convert numeric columns to appropriate type
         numeric_cols = ['runs', 'wickets', 'age']
-        for col in numeric_cols:
-            if col in processed_data.columns:
-                processed_data[col] = pd.to_numeric(processed_data[col], errors='coerce')
+        processed_data = processed_data.assign(**{
+            col: pd.to_numeric(processed_data[col], errors='coerce')
+            for col in numeric_cols
+        })
        
-        # Remove players with no data for runs and wickets
-        processed_data = processed_data.dropna(subset=['runs', 'wickets'])
+        # Remove players with no data for runs and wickets, and players with
+        # age > 50 or < 15, in one mask evaluated on the columns as they are
+        # (Arrow kernels for the declared dtypes), with no float round trip
+        mask = (
+            processed_data['runs'].notna()
+            & processed_data['wickets'].notna()
+            & processed_data['age'].between(15, 50)
+        )
+        processed_data = processed_data.loc[mask.fillna(False).astype(bool)]
        
-        # Remove players with age > 50 or < 15
-        processed_data = processed_data[(processed_data['age'] >= 15) & (processed_data['age'] <= 50)]
+        # NaNs are gone, so narrow the numeric columns to the smallest fitting ints
+        processed_data = processed_data.astype({'age': 'int8', 'runs': 'int32', 'wickets': 'int16'})
        
         # Add player type column
-        def determine_player_type(row):
-            if row['runs'] > 500 and row['wickets'] >= 50:
-                return "All-Rounder"
-            elif row['runs'] > 500:
-                return "Batsman"
-            else:
-                return "Bowler"
+        runs = processed_data['runs'].to_numpy()
+        wickets = processed_data['wickets'].to_numpy()
+        if njit is not None:
+            codes = np.empty(len(runs), dtype=np.int8)
+            _classify_players(runs, wickets, codes)
+        else:
+            codes = _select_player_types(runs, wickets)
+        processed_data['playerType'] = pd.Categorical.from_codes(
+            codes, categories=pd.Index(PLAYER_TYPES, dtype='string[pyarrow]')
+        )
        
-        processed_data['playerType'] = processed_data.apply(determine_player_type, axis=1)
-       
-        # Save processed data to temp folder
-        processed_file = os.path.join(self.temp_dir, "processed_data.csv")
-        processed_data.to_csv(processed_file, index=False)
+        # Store string columns as categoricals so sorts and compares use int codes
+        for col in CATEGORY_COLS:
+            processed_data[col] = processed_data[col].astype('category')
        
         return processed_data
    
+    def iter_merged_chunks(self, chunksize=100_000):
+        """Yield the input data from both sources in chunks of at most chunksize rows"""
+        csv_file = self.paths['csv_in']
+        json_file = self.paths['json_in']
+       
+        # The C parser returns usecols in file order, so reorder to the schema
+        with pd.read_csv(
+            csv_file,
+            chunksize=chunksize,
+            usecols=list(PLAYER_DTYPES),
+            dtype=PLAYER_DTYPES
+        ) as reader:
+            for chunk in reader:
+                yield chunk[list(PLAYER_DTYPES)]
+       
+        # Only line-delimited records can be streamed; a single JSON document
+        # has to be parsed whole, so it is read once through the cached reader
+        if not _is_json_lines(json_file):
+            yield self.read_json_data()
+            return
+        with pd.read_json(json_file, lines=True, chunksize=chunksize) as reader:
+            for chunk in reader:
+                yield chunk[list(PLAYER_DTYPES)].astype(PLAYER_DTYPES)
+   
+    def process_chunks(self, chunks):
+        """Process each chunk independently, yielding the filtered chunks"""
+        for chunk in chunks:
+            yield self._process_frame(chunk)
+   
+    def process_data_chunked(self, chunksize=100_000):
+        """Process the input data chunk by chunk so peak memory is bounded by one chunk"""
+        dataset_dir = self.paths['processed_dir']
+        if self.persist_intermediates:
+            # Remove parts left by an earlier run that produced more chunks
+            dataset_dir.mkdir(exist_ok=True)
+            for part in dataset_dir.glob("part-*.parquet"):
+                part.unlink()
+       
+        processed_chunks = []
+        for i, chunk in enumerate(self.process_chunks(self.iter_merged_chunks(chunksize))):
+            # Write each processed chunk as one part of a Parquet dataset
+            if self.persist_intermediates:
+                chunk.to_parquet(
+                    dataset_dir / f"part-{i}.parquet",
+                    engine='pyarrow',
+                    compression='zstd'
+                )
+            processed_chunks.append(chunk)
+       
+        # Only the small filtered chunks are combined, on shared categories
+        _unify_categories(processed_chunks)
+        return pd.concat(processed_chunks, ignore_index=True)
+   
     def read_output_data(self):
         """Read output data from the data processor"""
-        test_file = os.path.join(self.output_dir, "test_results.csv")
-        odi_file = os.path.join(self.output_dir, "odi_results.csv")
+        test_file = self.paths['test_out']
+        odi_file = self.paths['odi_out']
        
-        test_data = pd.read_csv(test_file) if os.path.exists(test_file) else pd.DataFrame()
-        odi_data = pd.read_csv(odi_file) if os.path.exists(odi_file) else pd.DataFrame()
+        # No declared schema here: malformed output must still load so that
+        # validate_schema can report it
+        read_kwargs = dict(engine='pyarrow', dtype_backend='pyarrow')
+        test_data = pd.read_csv(test_file, **read_kwargs) if test_file.exists() else pd.DataFrame()
+        odi_data = pd.read_csv(odi_file, **read_kwargs) if odi_file.exists() else pd.DataFrame()
        
         # Combine test and odi data
         output_data = pd.concat([test_data, odi_data], ignore_index=True)
@@ -92,36 +284,55 @@ class DataProcessorTester:
         expected_cols = ['playerName', 'age', 'runs', 'wickets', 'eventType', 'playerType']
         actual_cols = actual_data.columns.tolist()
        
-        # Prepare dataframes for comparison
-        expected_df = expected_data[expected_cols].sort_values('playerName').reset_index(drop=True)
-        actual_df = actual_data[actual_cols].sort_values('playerName').reset_index(drop=True)
+        # Prepare dataframes for comparison; the hash merge below needs no sort
+        expected_df = expected_data[expected_cols].reset_index(drop=True)
+        actual_df = actual_data[actual_cols].reset_index(drop=True)
        
-        # Add Result column
-        expected_df['Result'] = 'PASS'
+        # Compare string columns as categoricals on one shared category set; this
+        # only touches the local copies, so validate_schema still sees the raw dtypes
+        _unify_categories([expected_df, actual_df])
        
-        # Compare each row
-        for i, expected_row in expected_df.iterrows():
-            player_name = expected_row['playerName']
-            matching_rows = actual_df[actual_df['playerName'] == player_name]
+        # Whole-frame comparison first; per-row labelling is only needed on failure
+        if self._frames_match(expected_df, actual_df, expected_cols):
+            expected_df['Result'] = 'PASS'
+        else:
+            # Match each expected row to the first output row for the same player and event
+            merged = expected_df.merge(
+                actual_df.drop_duplicates(MATCH_KEYS),
+                on=MATCH_KEYS, how='left', suffixes=('_e', '_a'), indicator=True
+            )
            
-            if len(matching_rows) == 0:
-                # Player not found in output
-                expected_df.at[i, 'Result'] = 'FAIL'
-            else:
-                actual_row = matching_rows.iloc[0]
-               
-                # Compare all fields
-                for col in expected_cols:
-                    if expected_row[col] != actual_row[col]:
-                        expected_df.at[i, 'Result'] = 'FAIL'
-                        break
+            # Compare all fields in one row-aligned block comparison
+            compare_cols = [col for col in expected_cols if col not in MATCH_KEYS]
+            expected_block = merged[[f'{col}_e' for col in compare_cols]].set_axis(compare_cols, axis=1)
+            actual_block = merged[[f'{col}_a' for col in compare_cols]].set_axis(compare_cols, axis=1)
+            row_pass = expected_block.eq(actual_block).fillna(False).all(axis=1).to_numpy(dtype=bool)
+            missing = (merged['_merge'] == 'left_only').to_numpy()
+           
+            # Add Result column
+            expected_df['Result'] = np.where(row_pass & ~missing, 'PASS', 'FAIL')
        
         # Save validation results
-        result_file = os.path.join(self.temp_dir, "test_result.csv")
-        expected_df.to_csv(result_file, index=False)
+        expected_df.to_csv(self.paths['result'], index=False)
        
         return expected_df
 
+    def _frames_match(self, expected_df, actual_df, expected_cols):
+        """Check whether both frames hold the same rows, ignoring row order"""
+        if len(expected_df) != len(actual_df) or not set(expected_cols) <= set(actual_df.columns):
+            return False
+       
+        try:
+            pd.testing.assert_frame_equal(
+                expected_df.sort_values(MATCH_KEYS).reset_index(drop=True),
+                actual_df[expected_cols].sort_values(MATCH_KEYS).reset_index(drop=True),
+                check_like=True,
+                check_dtype=False
+            )
+        except AssertionError:
+            return False
+        return True
+
     def validate_schema(self, data):
         """Validate the schema of the output data"""
         expected_schema = {
@@ -135,25 +346,28 @@ class DataProcessorTester:
        
         schema_valid = True
         schema_errors = []
+        colset = frozenset(data.columns)
+        dtype_map = data.dtypes.to_dict()
        
         for column, expected_type in expected_schema.items():
             # Check if column exists
-            if column not in data.columns:
+            if column not in colset:
                 schema_valid = False
                 schema_errors.append(f"Column '{column}' is missing")
                 continue
            
-            # Check column type
+            # Check column type from the dtype alone, without touching the values
+            dtype = dtype_map[column]
             if expected_type == int:
-                if not pd.api.types.is_integer_dtype(data[column]):
-                    # Try to convert and see if values can be integers
+                if dtype.kind not in 'iu':
+                    # Try to convert a sample and see if values can be integers
                     try:
-                        pd.to_numeric(data[column], downcast='integer')
-                    except:
+                        pd.to_numeric(data[column].iloc[:1000], downcast='integer')
+                    except (ValueError, TypeError):
                         schema_valid = False
                         schema_errors.append(f"Column '{column}' should be integer type")
             elif expected_type == str:
-                if not pd.api.types.is_string_dtype(data[column]):
+                if not pd.api.types.is_string_dtype(dtype):
                     schema_valid = False
                     schema_errors.append(f"Column '{column}' should be string type")
        
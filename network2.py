@@ -1,15 +1,21 @@
 import pytest
+import numpy as np
 import pandas as pd
-import os
+import shutil
 import sys
 from pathlib import Path
 
 # Add parent directory to path to import main module
 sys.path.append(str(Path(__file__).parent.parent))
-from test_data_processor import DataProcessorTester # type: ignore
+from test_data_processor import DataProcessorTester, _classify_players, _select_player_types # type: ignore
+
+def _sorted_by_player(frame):
+    # Sort on the values, since each frame orders its categories differently
+    sort_cols = ['playerName', 'eventType']
+    return frame.sort_values(sort_cols, key=lambda col: col.astype(str)).reset_index(drop=True)
 
 class TestDataProcessor:
-    @pytest.fixture
+    @pytest.fixture(scope="session")
     def tester(self):
         # Setup test directories
         return DataProcessorTester(
@@ -18,6 +24,18 @@ class TestDataProcessor:
             temp_dir="tempDataSet"
         )
    
+    @pytest.fixture(scope="session")
+    def merged(self, tester):
+        return tester.merge_data()
+   
+    @pytest.fixture(scope="session")
+    def processed(self, tester, merged):
+        return tester.process_data(merged)
+   
+    @pytest.fixture(scope="session")
+    def output(self, tester):
+        return tester.read_output_data()
+   
     def test_csv_reader(self, tester):
         """Test if the CSV reader works correctly"""
         csv_data = tester.read_csv_data()
@@ -32,16 +50,36 @@ class TestDataProcessor:
         assert 'playerName' in json_data.columns, "JSON data should have playerName column"
         assert 'eventType' in json_data.columns, "JSON data should have eventType column"
    
-    def test_data_merge(self, tester):
+    def test_json_reader_columnar_document(self, tmp_path):
+        """Test if the JSON reader handles a single dict-of-lists document"""
+        (tmp_path / "players_2000_onwards.json").write_text(
+            '{"eventType": ["ODI", "TEST"], "playerName": ["abc456", "abc456"], '
+            '"age": [34, 34], "runs": [10, 1000], "wickets": [0, 600]}'
+        )
+        tester = DataProcessorTester(input_dir=tmp_path, temp_dir=tmp_path)
+        json_data = tester.read_json_data()
+        assert len(json_data) == 2, "Each list entry should become its own row"
+        assert list(json_data['runs']) == [10, 1000], "Runs should be read per player"
+   
+    def test_data_merge(self, merged):
         """Test if the data merge works correctly"""
-        merged_data = tester.merge_data()
+        merged_data = merged
         assert not merged_data.empty, "Merged data should not be empty"
-        assert os.path.exists(os.path.join(tester.temp_dir, "merged_data.csv")), "Merged data should be saved to temp directory"
    
-    def test_data_processing(self, tester):
+    def test_data_merge_persisted(self, tester, tmp_path):
+        """Test if the merged data is saved when intermediates are requested"""
+        persisting_tester = DataProcessorTester(
+            input_dir=tester.input_dir,
+            output_dir=tester.output_dir,
+            temp_dir=tmp_path,
+            persist_intermediates=True
+        )
+        persisting_tester.merge_data()
+        assert persisting_tester.paths['merged'].exists(), "Merged data should be saved to temp directory"
+   
+    def test_data_processing(self, processed):
         """Test if the data processing works correctly"""
-        merged_data = tester.merge_data()
-        processed_data = tester.process_data(merged_data)
+        processed_data = processed
        
         # Test player type assignment
         assert 'playerType' in processed_data.columns, "Processed data should have playerType column"
@@ -59,22 +97,143 @@ class TestDataProcessor:
         assert all(batsmen['playerType'] == 'Batsman'), "Players with >500 runs and <50 wickets should be Batsmen"
         assert all(bowlers['playerType'] == 'Bowler'), "Players with <=500 runs should be Bowlers"
    
+    def test_player_type_kernels_agree(self):
+        """Test if the per-player kernel and the np.select path give the same codes"""
+        runs = np.array([0, 500, 500, 501, 501, 501, 4000], dtype=np.int32)
+        wickets = np.array([0, 49, 50, 0, 49, 50, 800], dtype=np.int16)
+        codes = np.empty(len(runs), dtype=np.int8)
+        _classify_players(runs, wickets, codes)
+        np.testing.assert_array_equal(codes, _select_player_types(runs, wickets))
+        np.testing.assert_array_equal(codes, [0, 0, 0, 1, 1, 2, 2])
+   
+    def test_chunked_processing(self, tester, processed):
+        """Test if chunked processing matches processing the whole data at once"""
+        chunked_data = tester.process_data_chunked(chunksize=2)
+        pd.testing.assert_frame_equal(
+            _sorted_by_player(chunked_data),
+            _sorted_by_player(processed),
+            check_categorical=False
+        )
+   
+    def test_chunked_processing_json_array(self, tester, tmp_path):
+        """Test if chunked processing reads a JSON array input like merge_data does"""
+        shutil.copy(tester.paths['csv_in'], tmp_path)
+        tester.read_json_data().to_json(tmp_path / "players_2000_onwards.json", orient='records')
+        array_tester = DataProcessorTester(input_dir=tmp_path, temp_dir=tmp_path)
+       
+        chunked_data = array_tester.process_data_chunked(chunksize=2)
+        processed_data = array_tester.process_data(array_tester.merge_data())
+        pd.testing.assert_frame_equal(
+            _sorted_by_player(chunked_data),
+            _sorted_by_player(processed_data),
+            check_categorical=False
+        )
+   
+    def test_chunked_processing_persisted(self, tester, tmp_path):
+        """Test if persisted chunks replace the parts of an earlier run"""
+        persisting_tester = DataProcessorTester(
+            input_dir=tester.input_dir,
+            output_dir=tester.output_dir,
+            temp_dir=tmp_path,
+            persist_intermediates=True
+        )
+        dataset_dir = persisting_tester.paths['processed_dir']
+        dataset_dir.mkdir()
+        (dataset_dir / "part-999.parquet").write_bytes(b"")
+       
+        persisting_tester.process_data_chunked(chunksize=100_000)
+        assert sorted(p.name for p in dataset_dir.iterdir()) == ["part-0.parquet", "part-1.parquet"], "Only parts from this run should remain"
+   
     def test_output_validation(self, tester):
         """Test if the output validation works correctly"""
         # Run the complete test
         result = tester.run_test()
        
         # Check if the test_result.csv file is created
-        assert os.path.exists(os.path.join(tester.temp_dir, "test_result.csv")), "Test result should be saved to temp directory"
+        assert tester.paths['result'].exists(), "Test result should be saved to temp directory"
        
         # Check if result contains pass/fail information
         assert 'Result' in result['validation_result'].columns, "Validation result should have Result column"
    
-    def test_schema_validation(self, tester):
+    def test_output_validation_mismatch(self, tester, processed, tmp_path):
+        """Test if validation labels a wrong output row FAIL and correct rows PASS"""
+        output_data = processed.copy()
+        output_data.loc[output_data['playerName'] == 'ABC123', 'runs'] = 1
+        is_test = output_data['eventType'] == 'TEST'
+        output_data[is_test].to_csv(tmp_path / "test_results.csv", index=False)
+        output_data[~is_test].to_csv(tmp_path / "odi_results.csv", index=False)
+       
+        mismatch_tester = DataProcessorTester(
+            input_dir=tester.input_dir,
+            output_dir=tmp_path,
+            temp_dir=tmp_path
+        )
+        result = mismatch_tester.run_test()['validation_result']
+        is_wrong = result['playerName'] == 'ABC123'
+       
+        assert all(result.loc[is_wrong, 'Result'] == 'FAIL'), "Player with wrong runs should FAIL"
+        assert all(result.loc[~is_wrong, 'Result'] == 'PASS'), "Players with matching output should PASS"
+   
+    def test_output_validation_exact_match(self, tester, processed, tmp_path, monkeypatch):
+        """Test if an exactly matching output passes through the whole-frame check"""
+        is_test = processed['eventType'] == 'TEST'
+        processed[is_test].to_csv(tmp_path / "test_results.csv", index=False)
+        processed[~is_test].to_csv(tmp_path / "odi_results.csv", index=False)
+       
+        match_tester = DataProcessorTester(
+            input_dir=tester.input_dir,
+            output_dir=tmp_path,
+            temp_dir=tmp_path
+        )
+        frames_match_results = []
+        frames_match = match_tester._frames_match
+        def record_frames_match(*args):
+            frames_match_results.append(frames_match(*args))
+            return frames_match_results[-1]
+        monkeypatch.setattr(match_tester, '_frames_match', record_frames_match)
+       
+        result = match_tester.run_test()['validation_result']
+        assert frames_match_results == [True], "Exact output should take the whole-frame check"
+        assert all(result['Result'] == 'PASS'), "Every row of an exact output should PASS"
+   
+    def test_schema_validation(self, tester, output):
         """Test if the schema validation works correctly"""
-        output_data = tester.read_output_data()
+        output_data = output
         schema_valid, schema_errors = tester.validate_schema(output_data)
        
         # Check schema validation result
         assert isinstance(schema_valid, bool), "Schema validation should return a boolean"
-        assert isinstance(schema_errors, list), "Schema errors should be a list"
\ No newline at end of file
+        assert isinstance(schema_errors, list), "Schema errors should be a list"
+   
+    def test_schema_validation_reports_errors(self, tmp_path):
+        """Test if malformed output data is loaded and reported by schema validation"""
+        pd.DataFrame({
+            'eventType': ['ODI'],
+            'playerName': ['ABC123'],
+            'age': ['abc'],
+            'runs': [1000],
+            'wickets': [171]
+        }).to_csv(tmp_path / "odi_results.csv", index=False)
+        tester = DataProcessorTester(output_dir=tmp_path, temp_dir=tmp_path)
+        schema_valid, schema_errors = tester.validate_schema(tester.read_output_data())
+       
+        assert not schema_valid, "Malformed output should fail schema validation"
+        assert "Column 'age' should be integer type" in schema_errors, "Non-integer age should be reported"
+        assert "Column 'playerType' is missing" in schema_errors, "Missing playerType should be reported"
+   
+    def test_schema_validation_reports_numeric_strings(self, tmp_path):
+        """Test if string columns holding numbers are reported by schema validation"""
+        pd.DataFrame({
+            'eventType': [1],
+            'playerName': [2],
+            'age': [25],
+            'runs': [1000],
+            'wickets': [171],
+            'playerType': [3]
+        }).to_csv(tmp_path / "odi_results.csv", index=False)
+        tester = DataProcessorTester(output_dir=tmp_path, temp_dir=tmp_path)
+        schema_valid, schema_errors = tester.validate_schema(tester.read_output_data())
+       
+        assert not schema_valid, "Numeric string columns should fail schema validation"
+        for column in ('eventType', 'playerName', 'playerType'):
+            assert f"Column '{column}' should be string type" in schema_errors, f"Numeric {column} should be reported"
\ No newline at end of file